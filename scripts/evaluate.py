@@ -27,65 +27,222 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from os import listdir, path, scandir, walk
+import csv
+import pickle
+import re
+from os import path, scandir
 from sys import argv
-from decimal import Decimal
-from pandas import read_csv
-from scipy.stats import norm
-from prettytable import PrettyTable
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+# pyarrow's CSV reader is preferred, pandas is used when it is not installed.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pac
+    import pyarrow.dataset as ds
+    HAS_PYARROW = True
+except ImportError:
+    from pandas import read_csv
+    HAS_PYARROW = False
+# numba, if installed, compiles the reduction over the data of every file.
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 from plots import plot_table
 
 
+# Pattern of a measure's filename: Sxxxx_Tyy_Oz.csv
+FILENAME_REGEX = re.compile(r"S(\d+)_T(\d+)_O(\d+)\.csv$")
+
+# Parameters to calculate the mean of.
+COLUMNS = ["time_init", "time_sort"]
+
+# Format of the measure files, with no type inference on the needed columns.
+# The dataset scan itself takes care of only reading those columns.
+if HAS_PYARROW:
+    CSV_FORMAT = ds.CsvFileFormat(
+        parse_options=pac.ParseOptions(delimiter=';'),
+        convert_options=pac.ConvertOptions(
+            column_types={col: pa.float64() for col in COLUMNS}))
+
+
 
 def my_round(num: float) -> float:
     """Round up the given float number to its first 5 decimal points."""
-    return float(round(Decimal(num), 5))
+    return round(float(num), 5)
+
+
+
+def set_time_elapsed(file_mean: dict) -> None:
+    """Add the elapsed time to the means of a file."""
+    # Since elapsed time is the sum of init and sort times, it feels more
+    # natural to keep this relationship instead of calculating a mean for
+    # this parameter.
+    file_mean["time_elapsed"] = my_round(file_mean["time_init"] +
+                                         file_mean["time_sort"])
+
+
+
+# Mean and Standard Deviation.
+# For a normal distribution the MLE (Maximum Likelihood Estimation) of the
+# location and scale parameters are the arithmetic mean and the population
+# standard deviation (ddof=0) of the data.
+# Values that are too unlikely are then removed; in other words, only values
+# inside the range  [mean - std, mean + std]  are kept to calculate the mean.
+if HAS_NUMBA:
+    @njit(cache=True)
+    def trimmed_mean(data: np.ndarray) -> float:
+        """Calculate the mean of the data after removing the outliers, in a
+        single compiled loop; 0.0 if all the values are removed."""
+        mean = data.mean()
+        std = data.std()
+        total = 0.0
+        count = 0
+        for i in range(data.size):
+            if mean - std < data[i] < mean + std:
+                total += data[i]
+                count += 1
+        return total / count if count > 0 else 0.0
+else:
+    def trimmed_mean(data: np.ndarray) -> float:
+        """Calculate the mean of the data after removing the outliers; 0.0 if
+        all the values are removed."""
+        mean = data.mean()
+        std = data.std()
+        mask = (data > (mean - std)) & (data < (mean + std))
+        return data[mask].mean() if mask.any() else 0.0
+
+
+
+def read_measures(file: str) -> dict:
+    """Read the given file and return the data of every parameter to calculate
+    the mean of, as numpy arrays."""
+    content = read_csv(file, sep=';', usecols=COLUMNS,
+                       dtype={col: np.float64 for col in COLUMNS}, engine="c")
+    return {col: content[col].to_numpy() for col in COLUMNS}
+
+
+
+def calculate_file_mean(file: str) -> tuple:
+    """Calculate the mean of every parameter in the given file.
+
+    Return the filename together with a dictionary containing parameter names
+    as keys and their means as values."""
+    file_mean = {}
+    content = read_measures(file)
+
+    for col in COLUMNS:
+        file_mean[col] = my_round(trimmed_mean(content[col]))
+    set_time_elapsed(file_mean)
+
+    return file, file_mean
+
+
+
+def calculate_batch_means(files: list) -> dict:
+    """Calculate the mean of every parameter of all the given files at once.
+
+    The files are scanned as a single table, with the name of the file each
+    row comes from, so that every statistic is a grouped reduction instead of
+    a separate computation for every file."""
+    dataset = ds.dataset(files, format=CSV_FORMAT)
+    table = dataset.to_table(columns=COLUMNS + ["__filename"])
+
+    # Mean and Standard Deviation of every parameter in every file.
+    # The population standard deviation (ddof=0) is the MLE of the scale
+    # parameter of a normal distribution.
+    stats = table.group_by("__filename").aggregate(
+        [(col, "mean") for col in COLUMNS] +
+        [(col, "stddev") for col in COLUMNS])
+    table = table.join(stats, "__filename")
+
+    # Remove values that are too unlikely; in other words, only keep values
+    # inside the range  [mean - std, mean + std]. Discarded values become null
+    # and are ignored by the second mean.
+    trimmed = {"__filename": table["__filename"]}
+    for col in COLUMNS:
+        low = pc.subtract(table[col + "_mean"], table[col + "_stddev"])
+        high = pc.add(table[col + "_mean"], table[col + "_stddev"])
+        inside = pc.and_(pc.greater(table[col], low), pc.less(table[col], high))
+        trimmed[col] = pc.if_else(inside, table[col],
+                                  pa.scalar(None, pa.float64()))
+    trimmed_means = pa.table(trimmed).group_by("__filename").aggregate(
+        [(col, "mean") for col in COLUMNS])
+
+    all_means = {}
+    for row in trimmed_means.to_pylist():
+        file_mean = {}
+        for col in COLUMNS:
+            mean = row[col + "_mean"]
+            file_mean[col] = my_round(0.0 if mean is None else mean)
+        set_time_elapsed(file_mean)
+        all_means[row["__filename"]] = file_mean
+
+    return all_means
 
 
 
-def calculate_means(files: list) -> dict:
-    """Calculate, for every file, the mean of every parameter."""
+def load_means_cache(cache_file: str) -> dict:
+    """Load the means calculated during a previous run of the script.
+
+    The cache maps every filename to a tuple (key, file_mean), where key is the
+    (modification time, size) of the file when its means were calculated.
+    An empty cache is returned if the file does not exist or is not valid."""
+    try:
+        with open(cache_file, "rb") as file:
+            cache = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+
+def calculate_means(files: list, cache_file: str) -> dict:
+    """Calculate, for every file, the mean of every parameter.
+
+    Means of files that did not change since the last run are read from the
+    cache file instead of being calculated again."""
     # Dictionary in which keys are filenames and values are other dictionaries
     # containing: parameter names as keys and their means as values.
     all_means = {}
 
-    # Parameters to calculate the mean of.
-    columns = ["time_init", "time_sort"]
+    cache = load_means_cache(cache_file)
+    # Modification time and size of every file.
+    keys = {}
+    # Files not found in the cache, or modified after it was written.
+    stale_files = []
 
     for file in files:
-        file_mean = {}
-        content = read_csv(file, sep=';')
-
-        for col in columns:
-            curr_data = content[col]
-            # Mean and Standard Deviation
-            # .norm generates a Normal Continuos Distribution
-            # .fit generates the MLE (Maximum Likelihood Estimation) for the
-            # given data by minimizing the negative log-likelihood function.
-            # The return values are location and scale parameters. For a normal
-            # distribution the location is its mean.
-            mean, std = norm.fit(curr_data)
-            # Remove values that are too unlikely; in other words, only keep
-            # values inside the range  [mean - std, mean + std]
-            curr_data = content[(content[col] > (mean - std)) &
-                                (content[col] < (mean + std))][col]
-            if len(curr_data) == 0:
-                mean = my_round(0.0)
-            else:
-                mean = norm.fit(curr_data)[0]
-            file_mean[col] = my_round(mean)
-        # Since elapsed time is the sum of init and sort times, it feels more
-        # natural to keep this relationship instead of calculating a mean for
-        # this parameter.
-        file_mean["time_elapsed"] = my_round(file_mean["time_init"] +
-                                             file_mean["time_sort"])
-
-        all_means[file] = file_mean
+        keys[file] = (path.getmtime(file), path.getsize(file))
+        cached = cache.get(file)
+        if cached is not None and cached[0] == keys[file]:
+            all_means[file] = cached[1]
+        else:
+            stale_files.append(file)
+
+    if stale_files and HAS_PYARROW:
+        all_means.update(calculate_batch_means(stale_files))
+    # Every file is independent from the others, so they can be processed in
+    # parallel by a pool of worker processes.
+    elif stale_files:
+        with ProcessPoolExecutor() as executor:
+            for file, file_mean in executor.map(calculate_file_mean,
+                                                stale_files, chunksize=8):
+                all_means[file] = file_mean
+
+    new_cache = {file: (keys[file], all_means[file]) for file in files}
+    if new_cache != cache:
+        with open(cache_file, "wb") as file:
+            pickle.dump(new_cache, file)
 
     return all_means
 
 
 
+@lru_cache(maxsize=None)
 def parse_file_name(filename: str) -> tuple:
     """Get measure info (is_serial, size, n_threads, opt_lvl) from file name.
 
@@ -93,24 +250,12 @@ def parse_file_name(filename: str) -> tuple:
      - xxxx  is the Size
      - yy    is the number of Threads
      - z     is the Optimization level used during compilation."""
-    filename = path.basename(filename)
-
-    # Extract size.
-    size_start = filename.index('S') + 1
-    size_end = filename.index('_', size_start)
-    size = int(filename[size_start : size_end])
-
-    # Extract number of threads.
-    nt_start = filename.index('T') + 1
-    nt_end = filename.index('_', nt_start)
-    num_threads = int(filename[nt_start : nt_end])
-
-    # Extract optimization level.
-    ol_start = filename.index('O') + 1
-    ol_end = filename.index('.', ol_start)
-    opt_lvl = int(filename[ol_start : ol_end])
+    match = FILENAME_REGEX.search(path.basename(filename))
+    size = int(match[1])
+    num_threads = int(match[2])
+    opt_lvl = int(match[3])
 
-    is_serial = True if num_threads == 0 else False
+    is_serial = num_threads == 0
 
     return is_serial, size, num_threads, opt_lvl
 
@@ -119,26 +264,19 @@ def parse_file_name(filename: str) -> tuple:
 def create_row(file: str, is_serial: bool, size: int, num_threads: int,
                opt_lvl: int, means: dict) -> list:
     """Create a list containing all the information taken from the arguments."""
-    row = []
-
     if is_serial:
         measure_type = "Default" if opt_lvl == 0 else "Serial"
     else:
         measure_type = "Parallel"
 
-    row.append(measure_type)
-    row.append(size)
-    row.append(num_threads)
-    row.append(opt_lvl)
-
     # All the means of the measure's parameters.
-    for col in means[file].keys():
-        row.append(means[file][col])
+    file_mean = means[file]
+    row = [measure_type, size, num_threads, opt_lvl, file_mean["time_init"],
+           file_mean["time_sort"], file_mean["time_elapsed"]]
 
     # Speedup and Efficiency.
     if is_serial:
-        row.append(1) # speedup
-        row.append(1) # efficiency
+        row += [1, 1] # speedup, efficiency
     # If the measure is parallelized these two parameters will be calculated
     # directly in the make_table() function, taking into account the execution
     # time of the corresponding serial measure.
@@ -147,7 +285,34 @@ def create_row(file: str, is_serial: bool, size: int, num_threads: int,
 
 
 
-def make_table(root_dir: str, files: list, means: dict) -> None:
+def collect_files(root_dir: str) -> tuple:
+    """Walk the given directory tree once and find all the measure files.
+
+    Return the sorted list of subdirectories and a dictionary mapping every
+    directory to the sorted list of measure files it contains."""
+    subdirs = []
+    files_by_dir = {}
+
+    stack = [root_dir]
+    while stack:
+        directory = stack.pop()
+        with scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    stack.append(entry.path)
+                # Tables created by this script are not measure files.
+                elif entry.name.endswith(".csv") and "table" not in entry.name:
+                    files_by_dir.setdefault(directory, []).append(entry.path)
+
+    for dir_files in files_by_dir.values():
+        dir_files.sort()
+
+    return sorted(subdirs), files_by_dir
+
+
+
+def make_table(subdirs: list, files_by_dir: dict, means: dict) -> None:
     """Create a table storing, for every type of test, the mean of the results.
 
     Each table allows a comparison between every parallel measure, the
@@ -160,56 +325,81 @@ def make_table(root_dir: str, files: list, means: dict) -> None:
               "Time Total", "Speedup", "Efficiency"]
     rows = []
 
-    # All subdirectories in the output's root directory.
-    subdirs = sorted([d.path for d in scandir(root_dir) if d.is_dir()])
-
     for subdir in subdirs:
         # If current directory has optimization level 0 it surely contains only
         # 1 file with the measures made serially, and with -O0 compilation flag.
         # This is the current "default case".
         if subdir.endswith("opt_0"):
             # Get filename and parse the details.
-            file = listdir(subdir)[0]
+            file = files_by_dir[subdir][0]
             is_serial, size, num_threads, opt_lvl = parse_file_name(file)
-            first_row = create_row(subdir + "/" + file, is_serial, size,
-                                   num_threads, opt_lvl, means)
+            first_row = create_row(file, is_serial, size, num_threads, opt_lvl,
+                                   means)
             continue
 
-        # Every table's first row will contain the info about the default case
-        # of the problem.
-        rows.append(first_row)
-
-        # These are all the files in the current subdirectory. They all have
-        # measures made with optimization -Ox (x = 1, 2, 3).
-        curr_files = sorted([f for f in files if f.find(subdir + "/") >= 0])
-
-        # For every file in the directory create a new row to insert in the
-        # current table.
-        for file in curr_files:
-            is_serial, size, num_threads, opt_lvl = parse_file_name(file)
-
-            # Add all details in a list.
-            row = create_row(file, is_serial, size, num_threads, opt_lvl, means)
-
-            # Because the list of files is sorted, the first one will always be
-            # serial; thus, the time_serial variable will always be available
-            # when calculating speedup and efficiency of a parallelized measure.
-            if is_serial:
-                time_serial = float(means[file]['time_elapsed'])
-                # Speedup and Efficiency for a serial execution are both 1 and
-                # have therefore already been added to the row in create_row().
-            else:
-                time_parallel = float(means[file]['time_elapsed'])
-                # Speedup and Efficiency
-                speedup = my_round(time_serial / time_parallel)
-                efficiency = my_round(speedup / num_threads)
-                row.append(speedup)
-                row.append(efficiency)
-
-            rows.append(row)
-
-        # When all the rows have been built, write the table onto a file.
-        write_table(fields, rows, subdir)
+        # Rows are written onto the table's file as soon as they are built; they
+        # are still kept in memory for the plots of the current table.
+        with open(subdir + "/table.csv", "w", newline="",
+                  encoding="UTF-8") as table_file:
+            # Write table in standard CSV format, separator is ','.
+            writer = csv.writer(table_file)
+            writer.writerow(fields)
+
+            # Every table's first row will contain the info about the default
+            # case of the problem.
+            writer.writerow(first_row)
+            rows.append(first_row)
+
+            # These are all the files in the current subdirectory. They all have
+            # measures made with optimization -Ox (x = 1, 2, 3).
+            curr_files = files_by_dir.get(subdir, [])
+
+            # For every file in the directory create a new row to insert in the
+            # current table.
+            # Rows of the parallelized measures, with their total execution
+            # times and number of threads. Their Speedup and Efficiency are
+            # calculated all together once every file has been read.
+            parallel_rows = []
+            parallel_times = []
+            parallel_threads = []
+
+            for file in curr_files:
+                is_serial, size, num_threads, opt_lvl = parse_file_name(file)
+
+                # Add all details in a list.
+                row = create_row(file, is_serial, size, num_threads, opt_lvl,
+                                 means)
+
+                # Because the list of files is sorted, the first one will always
+                # be serial; thus, its row comes right after the default case
+                # and the time_serial variable will always be available when
+                # calculating speedup and efficiency of the parallelized
+                # measures.
+                if is_serial:
+                    time_serial = float(means[file]['time_elapsed'])
+                    # Speedup and Efficiency for a serial execution are both 1
+                    # and have therefore already been added to the row in
+                    # create_row().
+                    writer.writerow(row)
+                    rows.append(row)
+                else:
+                    parallel_rows.append(row)
+                    parallel_times.append(means[file]['time_elapsed'])
+                    parallel_threads.append(num_threads)
+
+            # Speedup and Efficiency, rounded with my_round() like every other
+            # value in the table.
+            if parallel_rows:
+                speedups = np.array([my_round(speedup) for speedup in
+                                     time_serial / np.array(parallel_times)])
+                efficiencies = speedups / np.array(parallel_threads)
+                for row, speedup, efficiency in zip(parallel_rows, speedups,
+                                                    efficiencies):
+                    row.append(my_round(speedup))
+                    row.append(my_round(efficiency))
+
+            writer.writerows(parallel_rows)
+            rows.extend(parallel_rows)
 
         # Create two images plotting Speedup and Efficiency over Number of
         # Threads.
@@ -219,17 +409,6 @@ def make_table(root_dir: str, files: list, means: dict) -> None:
 
 
 
-def write_table(fields: list, rows: list, directory: str) -> None:
-    """Write a table with fields and rows onto the given file."""
-    table = PrettyTable()
-    table.field_names = fields
-    table.add_rows(rows)
-    # Write table in standard CSV format, separator is ','.
-    with open(directory + "/table.csv", "w", encoding="UTF-8") as file:
-        file.write(table.get_csv_string())
-
-
-
 def main() -> None:
     """Main function."""
 
@@ -241,22 +420,23 @@ def main() -> None:
     directory = argv[1]
 
     # Get all files contained in the given directory
-    files = []
-    for root, dirs, files_found in walk(directory):
-        for file in files_found:
-            if file.endswith(".csv") and file.find("table") == -1:
-                files.append(path.join(root, file))
-    files = sorted(files)
+    subdirs, files_by_dir = collect_files(directory)
+    # Files are already sorted inside each directory, so only the directories
+    # need to be sorted to get all of them in order.
+    files = [file for dir_name in sorted(files_by_dir)
+             for file in files_by_dir[dir_name]]
 
     if len(files) == 0:
         print("No output files found. Exiting the script.")
         exit(1)
 
     print("Calculating means...")
-    means = calculate_means(files)
+    # Means of unchanged files are reused from the previous run.
+    cache_file = path.join(directory, ".means_cache.pkl")
+    means = calculate_means(files, cache_file)
 
     print("Creating tables and plots...")
-    make_table(directory, files, means)
+    make_table(subdirs, files_by_dir, means)
 
 
 
@@ -26,9 +26,22 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import matplotlib
+# Plots are only written onto files: use the non-interactive backend, which
+# does not need to load any GUI toolkit.
+matplotlib.use("Agg")
 import matplotlib.pyplot as pyplot
 
 
+# A single figure is reused for every plot, clearing it before drawing, to
+# avoid building a new one (and its axes) every time.
+FIGURE, AXES = pyplot.subplots(figsize=(7, 5))
+
+# Options used when writing the images, with a low resolution and no extra
+# optimization pass of the JPEG encoder.
+SAVEFIG_OPTIONS = {"dpi": 90, "pil_kwargs": {"optimize": False}}
+
+
 
 def plot_table(directory: str, fields: list, rows: list) -> None:
     """Create a plot for the Speedup and one for the Efficiency and write them
@@ -42,9 +55,9 @@ def plot_speedup(directory: str, fields: list, rows: list) -> None:
     """Create an image file plotting Speedup per Number of Threads."""
     x, y = get_axes_data(fields, rows, "Speedup")
 
-    pyplot.figure(figsize=(7, 5))
-    pyplot.plot(x, x, color="blue", marker="x", label="Speedup Ideal")
-    pyplot.plot(x, y, color="red", marker="o", label="Speedup Experimental")
+    AXES.clear()
+    AXES.plot(x, x, color="blue", marker="x", label="Speedup Ideal")
+    AXES.plot(x, y, color="red", marker="o", label="Speedup Experimental")
 
     # Write precise Y value next to every point
     for i in range(1, len(x)):
@@ -53,18 +66,17 @@ def plot_speedup(directory: str, fields: list, rows: list) -> None:
         # Don't write over the ideal line or the string won't be readable.
         if abs(x_pos - y_pos) < 0.6:
             y_pos -= 1 if y_pos > 1 else 0.8
-        pyplot.text(x_pos, y_pos, "%.3f" %y[i])
+        AXES.text(x_pos, y_pos, "%.3f" %y[i])
 
     # Plot configuration
-    pyplot.grid(b=True, which='major', color='#bbbbbb', linestyle='-')
-    pyplot.autoscale(enable=True, axis='x', tight=True)
-    pyplot.autoscale(enable=True, axis='y', tight=True)
-    pyplot.legend()
-    pyplot.xlabel("Number of Threads")
-    pyplot.ylabel("Speedup")
+    AXES.grid(True, which='major', color='#bbbbbb', linestyle='-')
+    AXES.autoscale(enable=True, axis='x', tight=True)
+    AXES.autoscale(enable=True, axis='y', tight=True)
+    AXES.legend()
+    AXES.set_xlabel("Number of Threads")
+    AXES.set_ylabel("Speedup")
 
-    pyplot.savefig(directory + "/plot_speedup.jpg")
-    pyplot.close()
+    FIGURE.savefig(directory + "/plot_speedup.jpg", **SAVEFIG_OPTIONS)
 
 
 
@@ -73,23 +85,22 @@ def plot_efficiency(directory: str, fields: list, rows: list) -> None:
     x, y = get_axes_data(fields, rows, "Efficiency")
     y[0] = 1
 
-    pyplot.figure(figsize=(7, 5))
-    pyplot.plot(x, y, color="green", marker="s", label="Efficiency")
+    AXES.clear()
+    AXES.plot(x, y, color="green", marker="s", label="Efficiency")
 
     # Write precise Y value next to every point
     for i in range(1, len(x)):
-        pyplot.text(x[i] - 0.25, y[i] + 0.05, "%.3f" %y[i])
+        AXES.text(x[i] - 0.25, y[i] + 0.05, "%.3f" %y[i])
 
     # Plot configuration
-    pyplot.grid(b=True, which='major', color='#bbbbbb', linestyle='-')
-    pyplot.autoscale(enable=True, axis='x', tight=True)
-    pyplot.autoscale(enable=True, axis='y', tight=True)
-    pyplot.legend()
-    pyplot.xlabel("Number of Threads")
-    pyplot.ylabel("Efficiency")
+    AXES.grid(True, which='major', color='#bbbbbb', linestyle='-')
+    AXES.autoscale(enable=True, axis='x', tight=True)
+    AXES.autoscale(enable=True, axis='y', tight=True)
+    AXES.legend()
+    AXES.set_xlabel("Number of Threads")
+    AXES.set_ylabel("Efficiency")
 
-    pyplot.savefig(directory + "/plot_efficiency.jpg")
-    pyplot.close()
+    FIGURE.savefig(directory + "/plot_efficiency.jpg", **SAVEFIG_OPTIONS)
 
 
 
@@ -99,12 +110,17 @@ def get_axes_data(fields: list, rows: list, y_data: str) -> tuple:
     x = [0]
     y = [0]
 
+    # Position of the needed fields inside each row.
+    type_index = fields.index("Type")
+    threads_index = fields.index("Threads")
+    y_index = fields.index(y_data)
+
     for row in rows:
         # Only consider Parallelized measures.
-        if row[fields.index("Type")] == "Parallel":
+        if row[type_index] == "Parallel":
             # The X axis will display the number of threads.
-            x.append(row[fields.index("Threads")])
+            x.append(row[threads_index])
             # The Y axis will display the needed data (either "Speedup" or
             # "Efficiency").
-            y.append(row[fields.index(y_data)])
+            y.append(row[y_index])
     return x, y